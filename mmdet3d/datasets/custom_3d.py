@@ -101,6 +101,10 @@ class Custom3DDataset(Dataset):
             pts_filename=pts_filename,
             sample_idx=sample_idx,
             file_name=pts_filename)
+        # packed infos store points and masks in one file per scene and
+        # record the byte offset of each channel
+        if 'packed_offsets' in info:
+            input_dict['packed_offsets'] = info['packed_offsets']
 
         if not self.test_mode:
             annos = self.get_ann_info(index)
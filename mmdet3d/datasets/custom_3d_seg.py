@@ -119,6 +119,10 @@ class Custom3DSegDataset(Dataset):
             pts_filename=pts_filename,
             sample_idx=sample_idx,
             file_name=pts_filename)
+        # packed infos store points and masks in one file per scene and
+        # record the byte offset of each channel
+        if 'packed_offsets' in info:
+            input_dict['packed_offsets'] = info['packed_offsets']
 
         if not self.test_mode:
             annos = self.get_ann_info(index)
@@ -308,6 +312,29 @@ class Custom3DSegDataset(Dataset):
         mmcv.dump(outputs, out)
         return outputs, tmp_dir
 
+    def get_gt_sem_mask(self, data_info):
+        """Load and convert the ground truth semantic mask of one scene.
+
+        Args:
+            data_info (dict): Info of the scene.
+
+        Returns:
+            np.ndarray: Semantic mask converted to labels.
+        """
+        mask_path = osp.join(self.data_root,
+                             data_info['pts_semantic_mask_path'])
+        offsets = data_info.get('packed_offsets', None)
+        if offsets is None:
+            return self.convert_to_label(mask_path)
+        # packed scene files store the int32 semantic channel at a
+        # recorded byte offset
+        mask = np.fromfile(
+            mask_path,
+            dtype=np.int32,
+            count=offsets['num_points'],
+            offset=offsets['semantic_mask'])
+        return self.convert_to_label(mask)
+
     def convert_to_label(self, mask):
         """Convert class_id in segmentation mask to label."""
         # TODO: currently only support loading from local
@@ -356,10 +383,7 @@ class Custom3DSegDataset(Dataset):
         ), f'Expect elements in results to be dict, got {type(results[0])}.'
         pred_sem_masks = [result['semantic_mask'] for result in results]
         gt_sem_masks = [
-            torch.from_numpy(
-                self.convert_to_label(
-                    osp.join(self.data_root,
-                             data_info['pts_semantic_mask_path'])))
+            torch.from_numpy(self.get_gt_sem_mask(data_info))
             for data_info in self.data_infos
         ]
         ret_dict = seg_eval(
@@ -361,15 +361,27 @@ class LoadPointsFromFile(object):
         self.file_client_args = file_client_args.copy()
         self.file_client = None
 
-    def _load_points(self, pts_filename):
+    def _load_points(self, pts_filename, offset=0, count=-1):
         """Private function to load point clouds data.
 
         Args:
             pts_filename (str): Filename of point clouds data.
+            offset (int, optional): Byte offset of the points inside the
+                file, used for packed scene files. Defaults to 0.
+            count (int, optional): Number of float32 values to read, or -1
+                to read to the end of the file. Defaults to -1.
 
         Returns:
             np.ndarray: An array containing point clouds data.
         """
+        if offset or count != -1:
+            # ranged read of one channel of a packed scene file; going
+            # through file_client.get would pull the whole packed blob
+            # (points + both masks) just to slice one channel
+            # TODO: currently only supports loading from local
+            mmcv.check_file_exist(pts_filename)
+            return np.fromfile(
+                pts_filename, dtype=np.float32, count=count, offset=offset)
         if self.file_client is None:
             self.file_client = mmcv.FileClient(**self.file_client_args)
         try:
@@ -397,7 +409,14 @@ class LoadPointsFromFile(object):
                 - points (:obj:`BasePoints`): Point clouds data.
         """
         pts_filename = results['pts_filename']
-        points = self._load_points(pts_filename)
+        offsets = results.get('packed_offsets', None)
+        if offsets is None:
+            points = self._load_points(pts_filename)
+        else:
+            points = self._load_points(
+                pts_filename,
+                offset=offsets['points'],
+                count=offsets['num_points'] * self.load_dim)
         points = points.reshape(-1, self.load_dim)
         points = points[:, self.use_dim]
         attribute_dims = None
@@ -469,7 +488,8 @@ class LoadAnnotations3D(LoadAnnotations):
             Defaults to False.
         poly2mask (bool, optional): Whether to convert polygon annotations
             to bitmasks. Defaults to True.
-        seg_3d_dtype (dtype, optional): Dtype of 3D semantic masks.
+        seg_3d_dtype (dtype, optional): Dtype of standalone 3D semantic
+            masks. Packed scene files always store int32 masks.
             Defaults to int64
         file_client_args (dict): Config dict of file clients, refer to
             https://github.com/open-mmlab/mmcv/blob/master/mmcv/fileio/file_client.py
@@ -565,16 +585,29 @@ class LoadAnnotations3D(LoadAnnotations):
             dict: The dict containing loaded 3D mask annotations.
         """
         pts_instance_mask_path = results['ann_info']['pts_instance_mask_path']
+        offsets = results['ann_info'].get('packed_offsets', None)
 
-        if self.file_client is None:
-            self.file_client = mmcv.FileClient(**self.file_client_args)
-        try:
-            mask_bytes = self.file_client.get(pts_instance_mask_path)
-            pts_instance_mask = np.frombuffer(mask_bytes, dtype=np.int)
-        except ConnectionError:
+        if offsets is not None:
+            # ranged read of the int32 instance channel of a packed scene
+            # file; file_client.get would pull the whole packed blob
+            # TODO: currently only supports loading from local
             mmcv.check_file_exist(pts_instance_mask_path)
             pts_instance_mask = np.fromfile(
-                pts_instance_mask_path, dtype=np.long)
+                pts_instance_mask_path,
+                dtype=np.int32,
+                count=offsets['num_points'],
+                offset=offsets['instance_mask'])
+        else:
+            # standalone mask files predate the packed format, int64
+            if self.file_client is None:
+                self.file_client = mmcv.FileClient(**self.file_client_args)
+            try:
+                mask_bytes = self.file_client.get(pts_instance_mask_path)
+                pts_instance_mask = np.frombuffer(mask_bytes, dtype=np.long)
+            except ConnectionError:
+                mmcv.check_file_exist(pts_instance_mask_path)
+                pts_instance_mask = np.fromfile(
+                    pts_instance_mask_path, dtype=np.long)
 
         results['pts_instance_mask'] = pts_instance_mask
         results['pts_mask_fields'].append('pts_instance_mask')
@@ -590,18 +623,32 @@ class LoadAnnotations3D(LoadAnnotations):
             dict: The dict containing the semantic segmentation annotations.
         """
         pts_semantic_mask_path = results['ann_info']['pts_semantic_mask_path']
+        offsets = results['ann_info'].get('packed_offsets', None)
 
-        if self.file_client is None:
-            self.file_client = mmcv.FileClient(**self.file_client_args)
-        try:
-            mask_bytes = self.file_client.get(pts_semantic_mask_path)
-            # add .copy() to fix read-only bug
-            pts_semantic_mask = np.frombuffer(
-                mask_bytes, dtype=self.seg_3d_dtype).copy()
-        except ConnectionError:
+        if offsets is not None:
+            # ranged read of the int32 semantic channel of a packed scene
+            # file; file_client.get would pull the whole packed blob
+            # TODO: currently only supports loading from local
             mmcv.check_file_exist(pts_semantic_mask_path)
             pts_semantic_mask = np.fromfile(
-                pts_semantic_mask_path, dtype=np.long)
+                pts_semantic_mask_path,
+                dtype=np.int32,
+                count=offsets['num_points'],
+                offset=offsets['semantic_mask'])
+        else:
+            # standalone mask files predate the packed format and default
+            # to int64 (seg_3d_dtype)
+            if self.file_client is None:
+                self.file_client = mmcv.FileClient(**self.file_client_args)
+            try:
+                mask_bytes = self.file_client.get(pts_semantic_mask_path)
+                # add .copy() to fix read-only bug
+                pts_semantic_mask = np.frombuffer(
+                    mask_bytes, dtype=self.seg_3d_dtype).copy()
+            except ConnectionError:
+                mmcv.check_file_exist(pts_semantic_mask_path)
+                pts_semantic_mask = np.fromfile(
+                    pts_semantic_mask_path, dtype=np.long)
 
         results['pts_semantic_mask'] = pts_semantic_mask
         results['pts_seg_fields'].append('pts_semantic_mask')
@@ -1,4 +1,5 @@
 import numpy as np
+import pickle
 from os import path as osp
 
 from mmdet3d.core import show_result, show_seg_result
@@ -8,6 +9,30 @@ from .custom_3d import Custom3DDataset
 from .custom_3d_seg import Custom3DSegDataset
 
 
+def load_scannet_infos(ann_file):
+    """Load ScanNet infos from an info file.
+
+    Supports both a single pickled list and the streamed format with one
+    pickle record per scene written by the ScanNet converter.
+
+    Args:
+        ann_file (str): Path of the annotation file.
+
+    Returns:
+        list[dict]: List of annotations.
+    """
+    data_infos = []
+    with open(ann_file, 'rb') as f:
+        while True:
+            try:
+                data_infos.append(pickle.load(f))
+            except EOFError:
+                break
+    if len(data_infos) == 1 and isinstance(data_infos[0], list):
+        data_infos = data_infos[0]
+    return data_infos
+
+
 @DATASETS.register_module()
 class ScanNetDataset(Custom3DDataset):
     r"""ScanNet Dataset for Detection Task.
@@ -63,6 +88,17 @@ class ScanNetDataset(Custom3DDataset):
             filter_empty_gt=filter_empty_gt,
             test_mode=test_mode)
 
+    def load_annotations(self, ann_file):
+        """Load annotations from ann_file.
+
+        Args:
+            ann_file (str): Path of the annotation file.
+
+        Returns:
+            list[dict]: List of annotations.
+        """
+        return load_scannet_infos(ann_file)
+
     def get_ann_info(self, index):
         """Get annotation info according to the given index.
 
@@ -105,6 +141,8 @@ class ScanNetDataset(Custom3DDataset):
             gt_labels_3d=gt_labels_3d,
             pts_instance_mask_path=pts_instance_mask_path,
             pts_semantic_mask_path=pts_semantic_mask_path)
+        if 'packed_offsets' in info:
+            anns_results['packed_offsets'] = info['packed_offsets']
         return anns_results
 
     def show(self, results, out_dir, show=True):
@@ -120,9 +158,13 @@ class ScanNetDataset(Custom3DDataset):
             data_info = self.data_infos[i]
             pts_path = data_info['pts_path']
             file_name = osp.split(pts_path)[-1].split('.')[0]
+            offsets = data_info.get('packed_offsets', None)
             points = np.fromfile(
                 osp.join(self.data_root, pts_path),
-                dtype=np.float32).reshape(-1, 6)
+                dtype=np.float32,
+                count=-1 if offsets is None else offsets['num_points'] * 6,
+                offset=0 if offsets is None else offsets['points']).reshape(
+                    -1, 6)
             gt_bboxes = self.get_ann_info(i)['gt_bboxes_3d'].tensor.numpy()
             pred_bboxes = result['boxes_3d'].tensor.numpy()
             show_result(points, gt_bboxes, pred_bboxes, out_dir, file_name,
@@ -218,6 +260,17 @@ class ScanNetSegDataset(Custom3DSegDataset):
             scene_idxs=scene_idxs,
             label_weight=label_weight)
 
+    def load_annotations(self, ann_file):
+        """Load annotations from ann_file.
+
+        Args:
+            ann_file (str): Path of the annotation file.
+
+        Returns:
+            list[dict]: List of annotations.
+        """
+        return load_scannet_infos(ann_file)
+
     def get_ann_info(self, index):
         """Get annotation info according to the given index.
 
@@ -236,6 +289,8 @@ class ScanNetSegDataset(Custom3DSegDataset):
                                           info['pts_semantic_mask_path'])
 
         anns_results = dict(pts_semantic_mask_path=pts_semantic_mask_path)
+        if 'packed_offsets' in info:
+            anns_results['packed_offsets'] = info['packed_offsets']
         return anns_results
 
     def show(self, results, out_dir, show=True):
@@ -251,12 +306,14 @@ class ScanNetSegDataset(Custom3DSegDataset):
             data_info = self.data_infos[i]
             pts_path = data_info['pts_path']
             file_name = osp.split(pts_path)[-1].split('.')[0]
+            offsets = data_info.get('packed_offsets', None)
             points = np.fromfile(
                 osp.join(self.data_root, pts_path),
-                dtype=np.float32).reshape(-1, 6)
-            sem_mask_path = data_info['pts_semantic_mask_path']
-            gt_sem_mask = self.convert_to_label(
-                osp.join(self.data_root, sem_mask_path))
+                dtype=np.float32,
+                count=-1 if offsets is None else offsets['num_points'] * 6,
+                offset=0 if offsets is None else offsets['points']).reshape(
+                    -1, 6)
+            gt_sem_mask = self.get_gt_sem_mask(data_info)
             pred_sem_mask = result['semantic_mask'].numpy()
             show_seg_result(points, gt_sem_mask,
                             pred_sem_mask, out_dir, file_name,
@@ -525,3 +525,29 @@ def test_seg_show():
     mmcv.check_file_exist(gt_file_path)
     mmcv.check_file_exist(pred_file_path)
     tmp_dir.cleanup()
+
+
+def test_load_scannet_infos():
+    import mmcv
+    import pickle
+    import tempfile
+    from os import path as osp
+
+    from mmdet3d.datasets.scannet_dataset import load_scannet_infos
+
+    infos = [
+        dict(point_cloud=dict(num_features=6, lidar_idx='scene0000_00')),
+        dict(point_cloud=dict(num_features=6, lidar_idx='scene0000_01'))
+    ]
+    with tempfile.TemporaryDirectory() as temp_dir:
+        # legacy format: one pickled list
+        legacy_file = osp.join(temp_dir, 'legacy_infos.pkl')
+        mmcv.dump(infos, legacy_file, 'pkl')
+        assert load_scannet_infos(legacy_file) == infos
+
+        # streamed format: one pickle record per scene
+        streamed_file = osp.join(temp_dir, 'streamed_infos.pkl')
+        with open(streamed_file, 'wb') as f:
+            for info in infos:
+                pickle.dump(info, f)
+        assert load_scannet_infos(streamed_file) == infos
@@ -0,0 +1,77 @@
+import mmcv
+import numpy as np
+import tempfile
+from os import path as osp
+
+from mmdet3d.datasets.pipelines import LoadAnnotations3D, LoadPointsFromFile
+
+
+def test_packed_scene_roundtrip():
+    from tools.data_converter.scannet_data_utils import ScanNetData
+
+    np.random.seed(0)
+    num_points = 100
+    points = np.random.rand(num_points, 6).astype(np.float32)
+    ins_label = np.random.randint(0, 5, size=num_points)
+    sem_label = np.random.choice([0, 1, 3, 39], size=num_points)
+    bboxes = np.concatenate(
+        [np.random.rand(2, 6), np.array([[3.], [39.]])], axis=1)
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        # prepare a tiny raw scene
+        instance_data_dir = osp.join(temp_dir, 'scannet_train_instance_data')
+        mmcv.mkdir_or_exist(instance_data_dir)
+        mmcv.mkdir_or_exist(osp.join(temp_dir, 'meta_data'))
+        with open(
+                osp.join(temp_dir, 'meta_data', 'scannetv2_train.txt'),
+                'w') as f:
+            f.write('scene0000_00\n')
+        np.save(osp.join(instance_data_dir, 'scene0000_00_vert.npy'), points)
+        np.save(
+            osp.join(instance_data_dir, 'scene0000_00_ins_label.npy'),
+            ins_label)
+        np.save(
+            osp.join(instance_data_dir, 'scene0000_00_sem_label.npy'),
+            sem_label)
+        np.save(osp.join(instance_data_dir, 'scene0000_00_bbox.npy'), bboxes)
+
+        # convert it to a packed scene file
+        scannet_data = ScanNetData(root_path=temp_dir)
+        infos = scannet_data.get_infos(num_workers=1)
+        assert len(infos) == 1
+        info = infos[0]
+        assert info['pts_path'] == 'scene_data/scene0000_00.bin'
+        offsets = info['packed_offsets']
+        assert offsets['num_points'] == num_points
+
+        # load the points channel back through the pipeline
+        load_points = LoadPointsFromFile(
+            coord_type='DEPTH', load_dim=6, use_dim=list(range(6)))
+        results = dict(
+            pts_filename=osp.join(temp_dir, info['pts_path']),
+            packed_offsets=offsets)
+        results = load_points(results)
+        loaded_points = results['points'].tensor.numpy()
+        assert np.allclose(loaded_points, points)
+
+        # load the mask channels back through the pipeline
+        load_annotations = LoadAnnotations3D(
+            with_bbox_3d=False,
+            with_label_3d=False,
+            with_mask_3d=True,
+            with_seg_3d=True)
+        results = dict(
+            ann_info=dict(
+                pts_instance_mask_path=osp.join(temp_dir,
+                                                info['pts_instance_mask_path']),
+                pts_semantic_mask_path=osp.join(temp_dir,
+                                                info['pts_semantic_mask_path']),
+                packed_offsets=offsets),
+            bbox3d_fields=[],
+            pts_mask_fields=[],
+            pts_seg_fields=[])
+        results = load_annotations(results)
+        assert results['pts_instance_mask'].dtype == np.int32
+        assert results['pts_semantic_mask'].dtype == np.int32
+        assert np.all(results['pts_instance_mask'] == ins_label)
+        assert np.all(results['pts_semantic_mask'] == sem_label)
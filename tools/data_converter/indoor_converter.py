@@ -34,16 +34,23 @@ def create_indoor_info_file(data_path,
             root_path=data_path, split='train', use_v1=use_v1)
         val_dataset = SUNRGBDData(
             root_path=data_path, split='val', use_v1=use_v1)
+
+        infos_train = train_dataset.get_infos(
+            num_workers=workers, has_label=True)
+        mmcv.dump(infos_train, train_filename, 'pkl')
+        infos_val = val_dataset.get_infos(num_workers=workers, has_label=True)
+        mmcv.dump(infos_val, val_filename, 'pkl')
     else:
         train_dataset = ScanNetData(root_path=data_path, split='train')
         val_dataset = ScanNetData(root_path=data_path, split='val')
 
-    infos_train = train_dataset.get_infos(num_workers=workers, has_label=True)
-    mmcv.dump(infos_train, train_filename, 'pkl')
+        # stream the infos straight to disk (one pickle record per scene)
+        # instead of collecting them all in memory first
+        train_dataset.get_infos(
+            num_workers=workers, has_label=True, out_path=train_filename)
+        val_dataset.get_infos(
+            num_workers=workers, has_label=True, out_path=val_filename)
     print(f'{pkl_prefix} info train file is saved to {train_filename}')
-
-    infos_val = val_dataset.get_infos(num_workers=workers, has_label=True)
-    mmcv.dump(infos_val, val_filename, 'pkl')
     print(f'{pkl_prefix} info val file is saved to {val_filename}')
 
     # generate infos for the semantic segmentation task
@@ -65,5 +72,5 @@ def create_indoor_info_file(data_path,
             num_points=8192,
             label_weight_func=lambda x: 1.0 / np.log(1.2 + x))
 
-        train_dataset.get_seg_infos()
-        val_dataset.get_seg_infos()
+        train_dataset.get_seg_infos(num_workers=workers)
+        val_dataset.get_seg_infos(num_workers=workers)
@@ -1,8 +1,222 @@
 import mmcv
+import multiprocessing as mp
+import numba
 import numpy as np
+import pickle
 from concurrent import futures as futures
+from functools import partial
 from os import path as osp
 
+from mmdet3d.datasets.scannet_dataset import load_scannet_infos
+
+
+def _dump_info_stream(infos, out_path):
+    """Write an iterable of infos as one pickle record per scene."""
+    with open(out_path, 'wb') as f:
+        for info in infos:
+            pickle.dump(info, f)
+    return out_path
+
+
+def _reorder_info_stream(infos, order):
+    """Yield out-of-order worker results in their original split order.
+
+    A result is buffered only until its predecessors have arrived, so the
+    buffer stays small in practice.
+
+    Args:
+        infos (iterable[dict]): Infos as handed back by the workers.
+        order (dict): Mapping from sample index to its split position.
+
+    Yields:
+        dict: Infos in split order.
+    """
+    pending = {}
+    next_pos = 0
+    for info in infos:
+        pending[order[info['point_cloud']['lidar_idx']]] = info
+        while next_pos in pending:
+            yield pending.pop(next_pos)
+            next_pos += 1
+
+
+def process_single_scene(sample_idx, instance_data_dir, scene_data_dir, split,
+                         cat_ids_lut, label2cat_arr, has_label):
+    """Process single ScanNet scene.
+
+    Kept at module level (instead of closing over ``ScanNetData``) so that it
+    stays picklable and can be dispatched to worker processes.
+
+    Args:
+        sample_idx (str): Index of the sample.
+        instance_data_dir (str): Directory of the extracted raw scene data.
+        scene_data_dir (str): Output directory of the packed scene files.
+        split (str): Split type of the data.
+        cat_ids_lut (np.ndarray): Lookup table mapping nyu40 category ids
+            to class labels.
+        label2cat_arr (np.ndarray): Lookup table mapping class labels to
+            class names.
+        has_label (bool): Whether the data has label.
+
+    Returns:
+        dict: Information of the scene.
+    """
+    print(f'{split} sample_idx: {sample_idx}')
+    info = dict()
+    pc_info = {'num_features': 6, 'lidar_idx': sample_idx}
+    info['point_cloud'] = pc_info
+    # the directories are resolved once by the caller, so the per-scene
+    # paths are plain f-strings instead of repeated osp.join calls
+    pts_filename = f'{instance_data_dir}/{sample_idx}_vert.npy'
+    pts_instance_mask_path = f'{instance_data_dir}/{sample_idx}_ins_label.npy'
+    pts_semantic_mask_path = f'{instance_data_dir}/{sample_idx}_sem_label.npy'
+
+    # memory-map the inputs so each array is streamed through the page
+    # cache instead of materialized on the Python heap
+    points = np.load(pts_filename, mmap_mode='r')
+    pts_instance_mask = np.load(pts_instance_mask_path, mmap_mode='r')
+    pts_semantic_mask = np.load(pts_semantic_mask_path, mmap_mode='r')
+
+    # pack points and masks of one scene into a single file: a header of
+    # four int64 values (num_points and the byte offset of each channel)
+    # followed by the channels stored one after another, so that a single
+    # channel can be memory-mapped without reading the others
+    num_points = points.shape[0]
+    header = np.empty(4, dtype=np.int64)
+    header[0] = num_points
+    header[1] = header.nbytes  # points, num_points x 6 float32
+    # nyu40/instance ids fit in int32; storing masks as int64 would
+    # double the bytes written here and re-read every training epoch
+    header[2] = header[1] + points.nbytes  # instance_mask, int32
+    header[3] = header[2] + num_points * 4  # semantic_mask, int32
+    packed_path = f'{scene_data_dir}/{sample_idx}.bin'
+    with open(packed_path, 'wb') as f:
+        header.tofile(f)
+        # pre-extend the file so the channels can be mmapped below
+        f.truncate(int(header[3]) + num_points * 4)
+    # copy the points into their memory-mapped channel so the kernel
+    # commits the pages lazily instead of funneling multi-MB writes
+    # through libc's buffered I/O
+    out = np.memmap(
+        packed_path,
+        dtype=points.dtype,
+        mode='r+',
+        offset=int(header[1]),
+        shape=points.shape)
+    out[...] = points
+    out.flush()
+    del out
+    # the masks are cast straight into the memory-mapped channels to
+    # avoid an intermediate heap copy
+    for mask, offset in ((pts_instance_mask, header[2]),
+                         (pts_semantic_mask, header[3])):
+        out = np.memmap(
+            packed_path,
+            dtype=np.int32,
+            mode='r+',
+            offset=int(offset),
+            shape=mask.shape)
+        np.copyto(out, mask, casting='unsafe')
+        out.flush()
+        del out
+
+    rel_packed_path = f'scene_data/{sample_idx}.bin'
+    info['pts_path'] = rel_packed_path
+    info['pts_instance_mask_path'] = rel_packed_path
+    info['pts_semantic_mask_path'] = rel_packed_path
+    info['packed_offsets'] = dict(
+        num_points=int(header[0]),
+        points=int(header[1]),
+        instance_mask=int(header[2]),
+        semantic_mask=int(header[3]))
+
+    if has_label:
+        annotations = {}
+        box_file = f'{instance_data_dir}/{sample_idx}_bbox.npy'
+        mmcv.check_file_exist(box_file)
+        boxes_with_classes = np.load(box_file)  # k, 6 + class
+        annotations['gt_num'] = boxes_with_classes.shape[0]
+        if annotations['gt_num'] != 0:
+            minmax_boxes3d = boxes_with_classes[:, :-1]  # k, 6
+            classes = boxes_with_classes[:, -1]  # k, 1
+            class_idx = cat_ids_lut[classes.astype(np.int64)]
+            # the LUT maps unknown nyu40 ids to -1, which would silently
+            # wrap around in the gathers below; fail loudly instead
+            assert (class_idx >= 0).all(), \
+                f'unexpected nyu40 id in {sample_idx}_bbox.npy'
+            annotations['name'] = label2cat_arr[class_idx]
+            annotations['location'] = minmax_boxes3d[:, :3]
+            annotations['dimensions'] = minmax_boxes3d[:, 3:6]
+            annotations['gt_boxes_upright_depth'] = minmax_boxes3d
+            annotations['index'] = np.arange(
+                annotations['gt_num'], dtype=np.int32)
+            annotations['class'] = class_idx.astype(np.int64)
+        info['annos'] = annotations
+    return info
+
+
+@numba.njit(cache=True)
+def _mask_to_bincount(mask, cat_id2class, num_classes):
+    """Fuse the mask filter, label gather and bincount into one pass.
+
+    Args:
+        mask (np.ndarray): Semantic mask of the scene.
+        cat_id2class (np.ndarray): Mapping from class ids to [0, 20) labels.
+        num_classes (int): Number of classes used for the seg task.
+
+    Returns:
+        tuple[int, np.ndarray]: Number of annotated points and per-label
+            point counts of the scene.
+    """
+    class_count = np.zeros(num_classes + 1, np.int64)
+    num_point = 0
+    num_cat_ids = cat_id2class.shape[0]
+    for i in range(mask.shape[0]):
+        cat_id = mask[i]
+        if cat_id != 0:
+            # njit does no bounds checking, so an id outside the LUT
+            # must fail loudly instead of reading out of bounds
+            if cat_id < 0 or cat_id >= num_cat_ids:
+                raise IndexError('semantic mask id out of cat_id2class range')
+            class_count[cat_id2class[cat_id]] += 1
+            num_point += 1
+    return num_point, class_count
+
+
+def _scene_label_stats(mask_info, cat_id2class, num_classes):
+    """Compute label statistics of a single scene for seg info generation.
+
+    Kept at module level so that it stays picklable and can be dispatched
+    to worker processes.
+
+    Args:
+        mask_info (tuple): ``(mask_path, offset, num_points)`` of the scene.
+            ``offset`` and ``num_points`` locate the semantic channel
+            inside a packed scene file and are None for standalone masks.
+        cat_id2class (np.ndarray): Mapping from class ids to [0, 20) labels.
+        num_classes (int): Number of classes used for the seg task.
+
+    Returns:
+        tuple[int, np.ndarray]: Number of annotated points and per-label
+            point counts of the scene.
+    """
+    mask_path, offset, num_points = mask_info
+    if offset is not None:
+        mask = np.memmap(
+            mask_path,
+            dtype=np.int32,
+            mode='r',
+            offset=offset,
+            shape=(num_points, ))
+    elif mask_path.endswith('npy'):
+        mask = np.load(mask_path)
+    else:
+        # standalone mask files predate the packed format and store int64
+        mask = np.fromfile(mask_path, dtype=np.long)
+    # the jitted kernel fuses the unannotated-point filter, the label
+    # gather and the bincount into one pass with no temporaries
+    return _mask_to_bincount(np.asarray(mask), cat_id2class, num_classes)
+
 
 class ScanNetData(object):
     """ScanNet data.
@@ -24,14 +238,27 @@ class ScanNetData(object):
             'refrigerator', 'showercurtrain', 'toilet', 'sink', 'bathtub',
             'garbagebin'
         ]
-        self.cat2label = {cat: self.classes.index(cat) for cat in self.classes}
-        self.label2cat = {self.cat2label[t]: t for t in self.cat2label}
         self.cat_ids = np.array(
             [3, 4, 5, 6, 7, 8, 9, 10, 11, 12, 14, 16, 24, 28, 33, 34, 36, 39])
+        # ndarray LUTs are the canonical mappings: the per-box lookups in
+        # process_single_scene are vectorized C gathers instead of dict
+        # lookups; unused ids map to -1
+        self._cat_ids_lut = np.full(
+            int(self.cat_ids.max()) + 1, -1, dtype=np.int32)
+        self._cat_ids_lut[self.cat_ids] = np.arange(
+            len(self.cat_ids), dtype=np.int32)
+        self._label2cat_arr = np.array(self.classes, dtype=object)
+        # dicts kept as thin views of the LUTs for external consumers
+        self.cat2label = {cat: self.classes.index(cat) for cat in self.classes}
+        self.label2cat = {self.cat2label[t]: t for t in self.cat2label}
         self.cat_ids2class = {
             nyu40id: i
             for i, nyu40id in enumerate(list(self.cat_ids))
         }
+        # frequently used directories, resolved once instead of per scene
+        self._instance_data_dir = osp.join(self.root_dir,
+                                           'scannet_train_instance_data')
+        self._scene_data_dir = osp.join(self.root_dir, 'scene_data')
         assert split in ['train', 'val', 'test']
         split_file = osp.join(self.root_dir, 'meta_data',
                               f'scannetv2_{split}.txt')
@@ -42,91 +269,72 @@ class ScanNetData(object):
         return len(self.sample_id_list)
 
     def get_box_label(self, idx):
-        box_file = osp.join(self.root_dir, 'scannet_train_instance_data',
-                            f'{idx}_bbox.npy')
+        box_file = f'{self._instance_data_dir}/{idx}_bbox.npy'
         mmcv.check_file_exist(box_file)
         return np.load(box_file)
 
-    def get_infos(self, num_workers=4, has_label=True, sample_id_list=None):
+    def get_infos(self,
+                  num_workers=4,
+                  has_label=True,
+                  sample_id_list=None,
+                  out_path=None):
         """Get data infos.
 
-        This method gets information from the raw data.
+        This method gets information from the raw data. The scenes are
+        processed in parallel with worker processes since each scene is
+        independent and the per-scene work is dominated by Python-level
+        computation that threads cannot overlap.
 
         Args:
-            num_workers (int): Number of threads to be used. Default: 4.
+            num_workers (int): Number of processes to be used. Set to 1 to
+                process the scenes serially (e.g. for debugging). Default: 4.
             has_label (bool): Whether the data has label. Default: True.
             sample_id_list (list[int]): Index list of the sample.
                 Default: None.
+            out_path (str, optional): If given, stream the infos to this
+                file (one pickle record per scene, readable with
+                :func:`load_scannet_infos`) as the workers finish, so peak
+                memory stays independent of the dataset size.
+                Default: None.
 
         Returns:
-            infos (list[dict]): Information of the raw data.
+            list[dict] | str: Information of the raw data, or ``out_path``
+                when streaming to disk.
         """
-
-        def process_single_scene(sample_idx):
-            print(f'{self.split} sample_idx: {sample_idx}')
-            info = dict()
-            pc_info = {'num_features': 6, 'lidar_idx': sample_idx}
-            info['point_cloud'] = pc_info
-            pts_filename = osp.join(self.root_dir,
-                                    'scannet_train_instance_data',
-                                    f'{sample_idx}_vert.npy')
-            pts_instance_mask_path = osp.join(self.root_dir,
-                                              'scannet_train_instance_data',
-                                              f'{sample_idx}_ins_label.npy')
-            pts_semantic_mask_path = osp.join(self.root_dir,
-                                              'scannet_train_instance_data',
-                                              f'{sample_idx}_sem_label.npy')
-
-            points = np.load(pts_filename)
-            pts_instance_mask = np.load(pts_instance_mask_path).astype(np.long)
-            pts_semantic_mask = np.load(pts_semantic_mask_path).astype(np.long)
-
-            mmcv.mkdir_or_exist(osp.join(self.root_dir, 'points'))
-            mmcv.mkdir_or_exist(osp.join(self.root_dir, 'instance_mask'))
-            mmcv.mkdir_or_exist(osp.join(self.root_dir, 'semantic_mask'))
-
-            points.tofile(
-                osp.join(self.root_dir, 'points', f'{sample_idx}.bin'))
-            pts_instance_mask.tofile(
-                osp.join(self.root_dir, 'instance_mask', f'{sample_idx}.bin'))
-            pts_semantic_mask.tofile(
-                osp.join(self.root_dir, 'semantic_mask', f'{sample_idx}.bin'))
-
-            info['pts_path'] = osp.join('points', f'{sample_idx}.bin')
-            info['pts_instance_mask_path'] = osp.join('instance_mask',
-                                                      f'{sample_idx}.bin')
-            info['pts_semantic_mask_path'] = osp.join('semantic_mask',
-                                                      f'{sample_idx}.bin')
-
-            if has_label:
-                annotations = {}
-                boxes_with_classes = self.get_box_label(
-                    sample_idx)  # k, 6 + class
-                annotations['gt_num'] = boxes_with_classes.shape[0]
-                if annotations['gt_num'] != 0:
-                    minmax_boxes3d = boxes_with_classes[:, :-1]  # k, 6
-                    classes = boxes_with_classes[:, -1]  # k, 1
-                    annotations['name'] = np.array([
-                        self.label2cat[self.cat_ids2class[classes[i]]]
-                        for i in range(annotations['gt_num'])
-                    ])
-                    annotations['location'] = minmax_boxes3d[:, :3]
-                    annotations['dimensions'] = minmax_boxes3d[:, 3:6]
-                    annotations['gt_boxes_upright_depth'] = minmax_boxes3d
-                    annotations['index'] = np.arange(
-                        annotations['gt_num'], dtype=np.int32)
-                    annotations['class'] = np.array([
-                        self.cat_ids2class[classes[i]]
-                        for i in range(annotations['gt_num'])
-                    ])
-                info['annos'] = annotations
-            return info
-
         sample_id_list = sample_id_list if sample_id_list is not None \
             else self.sample_id_list
-        with futures.ThreadPoolExecutor(num_workers) as executor:
-            infos = executor.map(process_single_scene, sample_id_list)
-        return list(infos)
+        # the output directory only needs to exist once, so create it
+        # here instead of stat()ing it again in every worker call
+        mmcv.mkdir_or_exist(self._scene_data_dir)
+        process_fn = partial(
+            process_single_scene,
+            instance_data_dir=self._instance_data_dir,
+            scene_data_dir=self._scene_data_dir,
+            split=self.split,
+            cat_ids_lut=self._cat_ids_lut,
+            label2cat_arr=self._label2cat_arr,
+            has_label=has_label)
+        if num_workers == 1:
+            infos = map(process_fn, sample_id_list)
+            if out_path is not None:
+                return _dump_info_stream(infos, out_path)
+            return list(infos)
+        # imap_unordered hands a result back as soon as any worker
+        # finishes, so a small scene never waits behind a slow prefix;
+        # scene sizes vary wildly, and with ordered map the tail of the
+        # job would idle on the slowest chunk
+        chunksize = max(1, min(8, len(sample_id_list) // (num_workers * 4)))
+        order = {
+            sample_idx: pos
+            for pos, sample_idx in enumerate(sample_id_list)
+        }
+        with mp.Pool(num_workers) as pool:
+            results = pool.imap_unordered(
+                process_fn, sample_id_list, chunksize=chunksize)
+            infos = _reorder_info_stream(results, order)
+            if out_path is not None:
+                return _dump_info_stream(infos, out_path)
+            return list(infos)
 
 
 class ScanNetSegData(object):
@@ -148,7 +356,7 @@ class ScanNetSegData(object):
                  num_points=8192,
                  label_weight_func=None):
         self.data_root = data_root
-        self.data_infos = mmcv.load(ann_file)
+        self.data_infos = load_scannet_infos(ann_file)
         self.split = split
         self.num_points = num_points
 
@@ -169,8 +377,9 @@ class ScanNetSegData(object):
         self.label_weight_func = (lambda x: 1.0 / np.log(1.2 + x)) if \
             label_weight_func is None else label_weight_func
 
-    def get_seg_infos(self):
-        scene_idxs, label_weight = self.get_scene_idxs_and_label_weight()
+    def get_seg_infos(self, num_workers=4):
+        scene_idxs, label_weight = self.get_scene_idxs_and_label_weight(
+            num_workers=num_workers)
         save_folder = osp.join(self.data_root, 'seg_info')
         mmcv.mkdir_or_exist(save_folder)
         np.save(
@@ -182,42 +391,71 @@ class ScanNetSegData(object):
         print(f'{self.split} resampled scene index and label weight saved')
 
     def _convert_to_label(self, mask):
-        """Convert class_id in loaded segmentation mask to label."""
+        """Convert class_id in loaded segmentation mask to label.
+
+        Unannotated points (class_id 0) map to ``self.ignore_index``
+        instead of being filtered out, so the conversion is one gather.
+        """
         if isinstance(mask, str):
             if mask.endswith('npy'):
                 mask = np.load(mask)
             else:
+                # standalone mask files predate the packed format and
+                # store int64
                 mask = np.fromfile(mask, dtype=np.long)
-        # first filter out unannotated points (labeled as 0)
-        mask = mask[mask != 0]
-        # then convert to [0, 20) labels
-        label = self.cat_id2class[mask]
+        label = self.cat_id2class[mask.astype(np.intp, copy=False)]
         return label
 
-    def get_scene_idxs_and_label_weight(self):
+    def get_scene_idxs_and_label_weight(self, num_workers=4):
         """Compute scene_idxs for data sampling and label weight for loss \
         calculation.
 
         We sample more times for scenes with more points. Label_weight is
-        inversely proportional to number of class points.
+        inversely proportional to number of class points. The per-scene
+        statistics are gathered by worker processes since each scene only
+        needs its own mask read and bincount.
+
+        Args:
+            num_workers (int): Number of processes to be used. Set to 1 to
+                process the scenes serially (e.g. for debugging). Default: 4.
         """
         num_classes = len(self.cat_ids)
+        mask_infos = []
+        for data_info in self.data_infos:
+            mask_path = \
+                f"{self.data_root}/{data_info['pts_semantic_mask_path']}"
+            offsets = data_info.get('packed_offsets', None)
+            if offsets is None:
+                mask_infos.append((mask_path, None, None))
+            else:
+                mask_infos.append((mask_path, offsets['semantic_mask'],
+                                   offsets['num_points']))
+        stats_fn = partial(
+            _scene_label_stats,
+            cat_id2class=self.cat_id2class,
+            num_classes=num_classes)
+        if num_workers == 1:
+            stats = [stats_fn(mask_info) for mask_info in mask_infos]
+        else:
+            with futures.ProcessPoolExecutor(num_workers) as executor:
+                stats = list(executor.map(stats_fn, mask_infos))
+
         num_point_all = []
         label_weight = np.zeros((num_classes + 1, ))  # ignore_index
-        for data_info in self.data_infos:
-            label = self._convert_to_label(
-                osp.join(self.data_root, data_info['pts_semantic_mask_path']))
-            num_point_all.append(label.shape[0])
-            class_count, _ = np.histogram(label, range(num_classes + 2))
+        for num_point, class_count in stats:
+            num_point_all.append(num_point)
             label_weight += class_count
 
         # repeat scene_idx for num_scene_point // num_sample_point times
-        sample_prob = np.array(num_point_all) / float(np.sum(num_point_all))
-        num_iter = int(np.sum(num_point_all) / float(self.num_points))
-        scene_idxs = []
-        for idx in range(len(self.data_infos)):
-            scene_idxs.extend([idx] * round(sample_prob[idx] * num_iter))
-        scene_idxs = np.array(scene_idxs).astype(np.int32)
+        num_point_all = np.asarray(num_point_all, dtype=np.int64)
+        total_points = int(num_point_all.sum())
+        # float32 is plenty for a normalization that only feeds a rounding
+        sample_prob = num_point_all.astype(np.float32) / np.float32(
+            total_points)
+        num_iter = int(total_points / float(self.num_points))
+        counts = np.rint(sample_prob * num_iter).astype(np.int64)
+        scene_idxs = np.repeat(
+            np.arange(len(self.data_infos), dtype=np.int32), counts)
 
         # calculate label weight, adopted from PointNet++
         label_weight = label_weight[:-1].astype(np.float32)